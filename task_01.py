@@ -1,107 +1,278 @@
+import bisect
+import calendar
+import functools
+import os
 import pickle
+import re
+import sys
+from array import array
 from collections import UserDict
-from datetime import datetime, timedelta
-
-class Field:
-    def __init__(self, value):
-        self.value = value
-
-    def __str__(self):
-        return str(self.value)
-
-# Class to store names
-class Name(Field):
-    pass
-
-# Class to store and validate phone numbers
-class Phone(Field):
-    def __init__(self, value):
-        # Validate the phone number before initializing
-        if not self.validate(value):
-            raise ValueError("Invalid phone number")
-        super().__init__(value)
-
-    @staticmethod
-    def validate(phone):
-        # Check if the phone number is exactly 10 digits
-        return phone.isdigit() and len(phone) == 10
-
-# Class to store and validate birthdays
-class Birthday(Field):
-    def __init__(self, value):
-        try:
-            # Try to convert the string value to a datetime object
-            self.value = datetime.strptime(value, "%d.%m.%Y")
-        except ValueError:
-            raise ValueError("Invalid date format. Use DD.MM.YYYY")
+from datetime import date, datetime, timedelta
+
+# Matches a phone number of exactly 10 ASCII digits
+_PHONE_MATCH = re.compile(r"\A[0-9]{10}\Z").match
+
+# Matches a DD.MM.YYYY date written with ASCII digits
+_DATE_MATCH = re.compile(r"\A[0-9]{2}\.[0-9]{2}\.[0-9]{4}\Z").match
+
+# Pack a (month, day) pair into one sortable uint16 birthday key
+def _bday_key(month, day):
+    return month * 32 + day
+
+# Date a birthday falls on in the given year; 29 February is
+# celebrated on 1 March in non-leap years
+def _birthday_in(birthday, year):
+    if birthday.month == 2 and birthday.day == 29 and not calendar.isleap(year):
+        return date(year, 3, 1)
+    return date(year, birthday.month, birthday.day)
+
+# Check that a phone number is exactly 10 digits
+def _validate_phone(phone):
+    return _PHONE_MATCH(phone) is not None
+
+# Convert a DD.MM.YYYY string to a date object
+def _parse_birthday(value):
+    # The layout is fixed, so check it with one match and slice it by hand
+    # instead of going through strptime
+    if _DATE_MATCH(value) is None:
+        raise ValueError("Invalid date format. Use DD.MM.YYYY")
+    try:
+        return date(int(value[6:10]), int(value[3:5]), int(value[0:2]))
+    except ValueError:
+        raise ValueError("Invalid date format. Use DD.MM.YYYY")
 
 # Class to store a single contact record
 class Record:
+    __slots__ = ("name", "phones", "birthday", "_books", "_phone_set", "_str_cache")
+
     def __init__(self, name):
-        self.name = Name(name)  # Store the name
+        # Interned so the book's dict key and this field share one string object
+        self.name = sys.intern(name)
         self.phones = []  # Initialize an empty list for phone numbers
         self.birthday = None  # Initialize birthday as None
+        self._books = []  # Address books that hold this record
+        self._phone_set = set()  # Same numbers as self.phones, for fast lookups
+        self._str_cache = None  # Rendered __str__, reset whenever the record changes
+
+    @classmethod
+    def _trusted(cls, name, phones, birthday=None):
+        # Build a record from previously saved data without re-validating phones
+        record = cls(name)
+        record.phones = list(phones)
+        record._phone_set = set(record.phones)
+        record.birthday = birthday
+        return record
+
+    def __str__(self):
+        if self._str_cache is None:
+            text = f"Contact name: {self.name}, phones: {'; '.join(self.phones)}"
+            if self.birthday is not None:
+                text += f", birthday: {self.birthday.strftime('%d.%m.%Y')}"
+            self._str_cache = text
+        return self._str_cache
+
+    def _changed(self):
+        # Drop cached renderings of this record and of its address book
+        self._str_cache = None
+        for book in self._books:
+            book._all_cache = None
 
     def add_phone(self, phone):
-        # Add a phone number to the record
-        self.phones.append(Phone(phone))
+        # Add a phone number to the record, skipping duplicates
+        if not _validate_phone(phone):
+            raise ValueError("Invalid phone number")
+        if phone not in self._phone_set:
+            self._phone_set.add(phone)
+            self.phones.append(phone)
+            self._changed()
 
     def remove_phone(self, phone):
         # Remove a phone number from the record
-        self.phones = [p for p in self.phones if p.value != phone]
+        if phone in self._phone_set:
+            self._phone_set.discard(phone)
+            # Numbers are unique per record, so only one entry needs removing
+            del self.phones[self.phones.index(phone)]
+            self._changed()
 
     def edit_phone(self, old_phone, new_phone):
         # Edit an existing phone number in the record
-        for p in self.phones:
-            if p.value == old_phone:
-                p.value = new_phone
+        if not _validate_phone(new_phone):
+            raise ValueError("Invalid phone number")
+        if old_phone not in self._phone_set or old_phone == new_phone:
+            return
+        if new_phone in self._phone_set:
+            # The new number is already stored, so just drop the old one
+            self.remove_phone(old_phone)
+            return
+        self.phones[self.phones.index(old_phone)] = new_phone
+        self._phone_set.discard(old_phone)
+        self._phone_set.add(new_phone)
+        self._changed()
 
     def find_phone(self, phone):
         # Find a phone number in the record
-        for p in self.phones:
-            if p.value == phone:
-                return p
-        return None
+        return phone if phone in self._phone_set else None
 
     def add_birthday(self, birthday):
         # Add a birthday to the record
-        self.birthday = Birthday(birthday)
-
-    def days_to_birthday(self):
-        # Calculate the number of days until the next birthday
+        new_birthday = _parse_birthday(birthday)
+        for book in self._books:
+            book._unindex_birthday(self)
+        self.birthday = new_birthday
+        for book in self._books:
+            book._index_birthday(self)
+        self._changed()
+
+    def days_to_birthday(self, today=None):
+        # Calculate the number of days until the next birthday;
+        # pass today when calling this for many records in a row
         if self.birthday is None:
             return None
-        today = datetime.now().date()
-        next_birthday = self.birthday.value.replace(year=today.year)
+        if today is None:
+            today = datetime.now().date()
+        next_birthday = _birthday_in(self.birthday, today.year)
         if next_birthday < today:
-            next_birthday = next_birthday.replace(year=today.year + 1)
+            next_birthday = _birthday_in(self.birthday, today.year + 1)
         return (next_birthday - today).days
 
 # Class to store the address book
 class AddressBook(UserDict):
+    def __init__(self, *args, **kwargs):
+        # Birthday index: packed (month, day) keys in a sorted uint16 array,
+        # plus a parallel list of the matching records
+        self._bday_keys = array("H")
+        self._bday_recs = []
+        self._all_cache = None  # Rendered listing of all records
+        super().__init__(*args, **kwargs)
+
+    def __str__(self):
+        if self._all_cache is None:
+            # Each record's line is cached on the record, so a rebuild only
+            # re-renders records that changed since the last listing
+            self._all_cache = "\n".join(map(str, self.data.values()))
+        return self._all_cache
+
     def add_record(self, record):
-        self.data[record.name.value] = record
+        self[record.name] = record
+
+    def __setitem__(self, name, record):
+        # Every way of storing a record (item assignment, update(), the
+        # constructor) goes through here, so the index always sees it.
+        # Records are keyed by their own name, so one record never sits
+        # under two keys of the same book
+        if name != record.name:
+            raise ValueError(f"Record {record.name!r} cannot be stored under {name!r}")
+        old = self.data.get(name)
+        if old is not None and old is not record:
+            self._release(old)
+        self.data[name] = record
+        if not any(book is self for book in record._books):
+            record._books.append(self)
+            self._index_birthday(record)
+        self._all_cache = None
+
+    def __delitem__(self, name):
+        self._release(self.data.pop(name))
+        self._all_cache = None
+
+    def __ior__(self, other):
+        # UserDict merges straight into self.data, which would skip the index
+        self.update(other)
+        return self
+
+    def copy(self):
+        # The copy shares the records but builds its own index
+        return self.__class__(self.data)
+
+    def _release(self, record):
+        # Forget a record that is no longer stored in this book
+        self._unindex_birthday(record)
+        record._books = [book for book in record._books if book is not self]
+
+    def _index_birthday(self, record):
+        # Insert the record's birthday into the sorted index
+        if record.birthday is None:
+            return
+        self._unindex_birthday(record)
+        key = _bday_key(record.birthday.month, record.birthday.day)
+        i = bisect.bisect_right(self._bday_keys, key)
+        self._bday_keys.insert(i, key)
+        self._bday_recs.insert(i, record)
+
+    def _unindex_birthday(self, record):
+        # Drop the record's entry from the sorted index, if present
+        if record.birthday is None:
+            return
+        key = _bday_key(record.birthday.month, record.birthday.day)
+        lo = bisect.bisect_left(self._bday_keys, key)
+        hi = bisect.bisect_right(self._bday_keys, key, lo)
+        for i in range(lo, hi):
+            if self._bday_recs[i] is record:
+                del self._bday_keys[i]
+                del self._bday_recs[i]
+                return
+
+    def _birthdays_between(self, start_key, end_key):
+        # Records whose birthday key falls within start_key..end_key inclusive
+        lo = bisect.bisect_left(self._bday_keys, start_key)
+        hi = bisect.bisect_right(self._bday_keys, end_key, lo)
+        return self._bday_recs[lo:hi]
 
     def find(self, name):
         return self.data.get(name, None)
 
+    def to_dict(self):
+        # Flat {name: {"phones": [...], "birthday": "DD.MM.YYYY" | None}} form for saving
+        return {
+            name: {
+                "phones": list(record.phones),
+                "birthday": record.birthday.strftime("%d.%m.%Y") if record.birthday else None,
+            }
+            for name, record in self.data.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Rebuild an address book from the output of to_dict(); the data was
+        # validated when it was entered, so phones are not checked again
+        book = cls()
+        for name, fields in data.items():
+            birthday = fields["birthday"]
+            if birthday is not None:
+                birthday = _parse_birthday(birthday)
+            book.add_record(Record._trusted(name, fields["phones"], birthday))
+        return book
+
     def get_upcoming_birthdays(self, days=30):
+        # A negative window ends before today, so nothing is upcoming
+        if days < 0:
+            return []
         today = datetime.now().date()
-        upcoming_birthdays = []
-        for record in self.data.values():
-            if record.birthday is not None:
-                birthday = record.birthday.value.replace(year=today.year)
-                if today <= birthday <= today + timedelta(days=days):
-                    upcoming_birthdays.append(record)
-        return upcoming_birthdays
+        end = today + timedelta(days=days)
+        start_key = _bday_key(today.month, today.day)
+        end_key = _bday_key(end.month, end.day)
+        # On 1 March of a non-leap year, 29 February birthdays are celebrated today
+        if start_key == _bday_key(3, 1) and not calendar.isleap(today.year):
+            start_key = _bday_key(2, 29)
+        # The window wraps into the next year when it ends in an earlier month/day
+        if end.year != today.year:
+            # A window of a year or more covers every date; stop the second
+            # range just before today's key so no record is returned twice
+            if days >= 365:
+                end_key = start_key - 1
+            return (self._birthdays_between(start_key, _bday_key(12, 31))
+                    + self._birthdays_between(_bday_key(1, 1), end_key))
+        return self._birthdays_between(start_key, end_key)
 
 # Decorator to handle input errors
 def input_error(func):
-    def wrapper(*args, **kwargs):
+    # Handlers are always called as func(args, book), so no *args/**kwargs packing
+    @functools.wraps(func)
+    def wrapper(args, book):
         try:
-            return func(*args, **kwargs)
+            return func(args, book)
         except (KeyError, ValueError, IndexError) as e:
-            return str(e)
+            return str(e) or f"{func.__name__} failed"
     return wrapper
 
 # Function to add a new contact
@@ -130,12 +301,12 @@ def show_phone(args, book):
     record = book.find(name)
     if record is None:
         return "Contact not found."
-    return ", ".join(str(phone) for phone in record.phones)
+    return ", ".join(record.phones)
 
 # Function to show all contacts
 @input_error
 def show_all(args, book):
-    return "\n".join(str(record) for record in book.data.values())
+    return str(book)
 
 # Function to add a birthday to a contact
 @input_error
@@ -156,7 +327,7 @@ def show_birthday(args, book):
         return "Contact not found."
     if record.birthday is None:
         return f"{name} has no birthday set."
-    return f"{name}'s birthday: {record.birthday.value.strftime('%d.%m.%Y')}"
+    return f"{name}'s birthday: {record.birthday.strftime('%d.%m.%Y')}"
 
 # Function to show upcoming birthdays
 @input_error
@@ -164,24 +335,87 @@ def birthdays(args, book):
     upcoming_birthdays = book.get_upcoming_birthdays()
     if not upcoming_birthdays:
         return "No upcoming birthdays."
-    return "\n".join(f"{record.name.value}'s birthday is on {record.birthday.value.strftime('%d.%m.%Y')}" for record in upcoming_birthdays)
+    return "\n".join(f"{record.name}'s birthday is on {record.birthday.strftime('%d.%m.%Y')}" for record in upcoming_birthdays)
+
+# Handlers for commands that take (args, book) and return a reply
+COMMANDS = {
+    "add": add_contact,
+    "change": change_phone,
+    "phone": show_phone,
+    "all": show_all,
+    "add-birthday": add_birthday,
+    "show-birthday": show_birthday,
+    "birthdays": birthdays,
+}
 
 # Helper function to parse user input
 def parse_input(user_input):
-    return user_input.split()
+    # Split into a lowercased command and its arguments
+    parts = user_input.split()
+    if not parts:
+        return "", []
+    return parts[0].lower(), parts[1:]
 
 # Function to save the address book to a file
 def save_data(book, filename="addressbook.pkl"):
     with open(filename, "wb") as f:
-        pickle.dump(book, f)
+        pickle.dump(book.to_dict(), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+# Classes that older versions pickled directly instead of saving to_dict()
+_LEGACY_CLASSES = {"AddressBook", "Record", "Name", "Phone", "Birthday"}
+# Module names those pickles may reference: run as a script or imported
+_LEGACY_MODULES = {"__main__", "task_01"}
+
+# Stand-in for a legacy pickled object; only its attributes are needed
+class _LegacyObject:
+    pass
+
+# Unpickler that reads legacy class references as plain attribute holders
+class _BookUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if module in _LEGACY_MODULES and name in _LEGACY_CLASSES:
+            return _LegacyObject
+        return super().find_class(module, name)
+
+# Convert a legacy pickled AddressBook into the current classes
+def _from_legacy(old_book):
+    book = AddressBook()
+    for name, old in old_book.data.items():
+        # Old records could hold the same number twice
+        phones = list(dict.fromkeys(phone.value for phone in old.phones))
+        birthday = old.birthday.value.date() if old.birthday is not None else None
+        book.add_record(Record._trusted(name, phones, birthday))
+    return book
 
 # Function to load the address book from a file
 def load_data(filename="addressbook.pkl"):
     try:
         with open(filename, "rb") as f:
-            return pickle.load(f)
+            data = _BookUnpickler(f).load()
+        if isinstance(data, _LegacyObject):
+            return _from_legacy(data)
+        return AddressBook.from_dict(data)
     except FileNotFoundError:
         return AddressBook()
+    except (pickle.UnpicklingError, EOFError, AttributeError, KeyError, TypeError, ValueError) as e:
+        # Keep the unreadable file aside so saving on exit does not overwrite it
+        backup = _move_aside(filename)
+        print(f"Could not read {filename} ({e}). It was moved to {backup}; starting with an empty address book.")
+        return AddressBook()
+
+# Rename an unreadable data file to the first free <filename>.bak[.N] name
+def _move_aside(filename):
+    backup = filename + ".bak"
+    n = 0
+    while os.path.exists(backup):
+        n += 1
+        backup = f"{filename}.bak.{n}"
+    try:
+        os.rename(filename, backup)
+    except OSError as e:
+        # Stop rather than let the exit save overwrite the unreadable file
+        raise SystemExit(f"Could not read {filename} or move it aside ({e}). Fix or remove it and restart.")
+    return backup
 
 # Main function to handle user commands
 def main():
@@ -191,7 +425,7 @@ def main():
     print("Welcome to the assistant bot!")
     while True:
         user_input = input("Enter a command: ")
-        command, *args = parse_input(user_input)
+        command, args = parse_input(user_input)
 
         if command in ["close", "exit"]:
             print("Good bye!")
@@ -201,26 +435,8 @@ def main():
         elif command == "hello":
             print("How can I help you?")
 
-        elif command == "add":
-            print(add_contact(args, book))
-
-        elif command == "change":
-            print(change_phone(args, book))
-
-        elif command == "phone":
-            print(show_phone(args, book))
-
-        elif command == "all":
-            print(show_all(args, book))
-
-        elif command == "add-birthday":
-            print(add_birthday(args, book))
-
-        elif command == "show-birthday":
-            print(show_birthday(args, book))
-
-        elif command == "birthdays":
-            print(birthdays(args, book))
+        elif command in COMMANDS:
+            print(COMMANDS[command](args, book))
 
         else:
             print("Invalid command.")